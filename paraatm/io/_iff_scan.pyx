@@ -0,0 +1,73 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled kernels for scanning raw IFF file contents
+
+These are equivalent to _scan_lines_numpy and _gather_lines_numpy in
+paraatm.io.iff, and are built by setup.py if Cython is available.
+"""
+
+import numpy as np
+
+def scan_lines(const unsigned char[::1] data):
+    """Locate the lines of an IFF file and their record types"""
+    cdef Py_ssize_t n = data.shape[0]
+    cdef Py_ssize_t nlines = 0
+    cdef Py_ssize_t i
+    for i in range(n):
+        if data[i] == 10:
+            nlines += 1
+    if n > 0 and data[n-1] != 10:
+        nlines += 1
+
+    starts_arr = np.empty(nlines, np.int64)
+    ends_arr = np.empty(nlines, np.int64)
+    record_types_arr = np.zeros(nlines, np.int64)
+    cdef long long[::1] starts = starts_arr
+    cdef long long[::1] ends = ends_arr
+    cdef long long[::1] record_types = record_types_arr
+
+    cdef Py_ssize_t line = 0
+    cdef Py_ssize_t start = 0
+    cdef long long value = 0
+    cdef bint in_digits = True
+    cdef unsigned char c
+    with nogil:
+        for i in range(n):
+            c = data[i]
+            if in_digits:
+                if c >= 48 and c <= 57:
+                    value = value * 10 + c - 48
+                else:
+                    in_digits = False
+            if c == 10:
+                starts[line] = start
+                ends[line] = i + 1
+                record_types[line] = value
+                line += 1
+                start = i + 1
+                value = 0
+                in_digits = True
+        if start < n:
+            starts[line] = start
+            ends[line] = n
+            record_types[line] = value
+
+    return starts_arr, ends_arr, record_types_arr
+
+cdef _gather(const unsigned char[::1] data, const long long[::1] starts, const long long[::1] ends, const unsigned char[::1] selected):
+    cdef Py_ssize_t j, k, pos = 0, size = 0
+    for j in range(starts.shape[0]):
+        if selected[j]:
+            size += ends[j] - starts[j]
+    out_arr = np.empty(size, np.uint8)
+    cdef unsigned char[::1] out = out_arr
+    with nogil:
+        for j in range(starts.shape[0]):
+            if selected[j]:
+                for k in range(starts[j], ends[j]):
+                    out[pos] = data[k]
+                    pos += 1
+    return out_arr
+
+def gather_lines(data, starts, ends, selected):
+    """Concatenate the selected lines of raw IFF file contents"""
+    return _gather(data, starts, ends, np.asarray(selected).view(np.uint8))
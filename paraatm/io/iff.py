@@ -1,10 +1,312 @@
 """Functions for reading Integrated Flight Format (IFF) files"""
 
+import functools
+import io
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from pkg_resources import parse_version
+from packaging.version import Version
 
-def read_iff_file(filename, record_types=3, callsigns=None, chunksize=50000, encoding='latin-1'):
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+except ImportError:
+    # pyarrow is optional; fall back to pd.read_csv if unavailable
+    pv = None
+
+# Renaming of columns for consistency with other PARA-ATM data
+_RENAMES = {'recTime':'time',
+            'AcId':'callsign',
+            'coord1':'latitude',
+            'coord2':'longitude',
+            'alt':'altitude',
+            'rateOfClimb':'rocd',
+            'groundSpeed':'tas',
+            'course':'heading'}
+
+# Columns that are always read when a subset of columns is requested
+_REQUIRED_COLS = {'recType','recTime','AcId','coord1','coord2','alt'}
+
+# Data types for each record type, by column name.  Specifying these
+# avoids type inference by the CSV reader, which can also mangle text
+# fields (for example, pyarrow infers msgType values such as 0xE02 as
+# hex integers).  Numeric columns use floating point types, as values
+# may be missing.  Highly repetitive text fields, such as callsigns and
+# airports, are read as categories.  Columns that are not listed are
+# left to inference.
+_COMMON_DTYPES = {'recType':'int8','recTime':'float64','Source':'category','msgType':'str','AcId':'category'}
+_POSITION_DTYPES = {'coord1':'float64','coord2':'float64','alt':'float64'}
+_DTYPES = {2:{**_COMMON_DTYPES, 'acType':'category','Orig':'category','Dest':'category','opsType':'str','estOrig':'category','estDest':'category','modeSCode':'str'},
+           3:{**_COMMON_DTYPES, **_POSITION_DTYPES, 'groundSpeed':'float64','course':'float64','rateOfClimb':'float64','scratchPad':'str','airportCode':'category','modeSCode':'str'},
+           4:{**_COMMON_DTYPES, 'acType':'category','Orig':'category','Dest':'category','altcode':'str','route':'str','modeSCode':'str'},
+           6:{'recType':'int8','recTime':'float64','Source':'category','msgType':'str'},
+           7:{**_COMMON_DTYPES, **_POSITION_DTYPES},
+           8:{**_COMMON_DTYPES, 'acType':'category','Orig':'category','Dest':'category'},
+           9:{**_COMMON_DTYPES, **_POSITION_DTYPES},
+           10:_COMMON_DTYPES}
+
+# Columns for each record type, from version 2.6 specification.
+_BASE_COLS = {0:('recType','comment'),
+              1:('recType','fileType','fileFormatVersion'),
+              2:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','acType','Orig','Dest','opsType','estOrig','estDest'),
+              3:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','coord1','coord2','alt','significance','coord1Accur','coord2Accur','altAccur','groundSpeed','course','rateOfClimb','altQualifier','altIndicator','trackPtStatus','leaderDir','scratchPad','msawInhibitInd','assignedAltString','controllingFac','controllingSeg','receivingFac','receivingSec','activeContr','primaryContr','kybrdSubset','kybrdSymbol','adsCode','opsType','airportCode'),
+              4:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','acType','Orig','Dest','altcode','alt','maxAlt','assignedAltString','requestedAltString','route','estTime','fltCat','perfCat','opsType','equipList','coordinationTime','coordinationTimeType','leaderDir','scratchPad1','scratchPad2','fixPairScratchPad','prefDepArrRoute','prefDepRoute','prefArrRoute'),
+              5:('recType','dataSource','programName','programVersion'),
+              6:('recType','recTime','Source','msgType','rectypeCat','sectorizationString'),
+              7:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','coord1','coord2','alt','significance','coord1Accur','coord2Accur','altAccur','msawtype','msawTimeCat','msawLocCat','msawMinSafeAlt','msawIndex1','msawIndex2','msawVolID'),
+              8:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','acType','Orig','Dest','depTime','depTimeType','arrTime','arrTimeType'),
+              9:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','coord1','coord2','alt','pitchAngle','trueHeading','rollAngle','trueAirSpeed','fltPhaseIndicator'),
+              10:('recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','configType','configSpec')}
+
+@functools.lru_cache(maxsize=16)
+def _cols_for_version(version):
+    """Return the columns for each record type in a given format version
+
+    Parameters
+    ----------
+    version : str
+        File format version, from record type 1
+
+    Returns
+    -------
+    dict
+        Mapping of record type to tuple of column names
+    """
+    cols = dict(_BASE_COLS)
+    version = Version(version)
+
+    # For newer versions, additional columns are supported.  However,
+    # this code could be commented out, and it should still be
+    # compatible with newer versions, but just ignoring the additional
+    # columns.
+    if version >= Version('2.13'):
+        cols[2] += ('modeSCode',)
+        cols[3] += ('trackNumber','tptReturnType','modeSCode')
+        cols[4] += ('coordinationPoint','coordinationPointType','trackNumber','modeSCode')
+    if version >= Version('2.15'):
+        cols[3] += ('sensorTrackNumberList','spi','dvs','dupM3a','tid')
+
+    return cols
+
+@functools.lru_cache(maxsize=64)
+def _renamed_cols(cols):
+    """Return column names after applying _RENAMES
+
+    Parameters
+    ----------
+    cols : tuple of str
+        Column names, as in the IFF specification
+    """
+    return tuple(_RENAMES.get(c, c) for c in cols)
+
+def _scan_lines_numpy(data):
+    """Locate the lines of an IFF file and their record types
+
+    Parameters
+    ----------
+    data : ndarray of uint8
+        Raw file contents
+
+    Returns
+    -------
+    starts, ends : ndarray
+        Byte offsets of the start of each line, and one past its end
+    record_types : ndarray
+        Record type of each line, given by the leading integer field
+    """
+    ends = np.flatnonzero(data == ord('\n')) + 1
+    if len(ends) == 0 or ends[-1] != len(data):
+        # Final line has no trailing newline
+        ends = np.append(ends, len(data))
+    starts = np.concatenate(([0], ends[:-1]))
+
+    # Accumulate the leading digits of each line, one position at a
+    # time.  Record types are small, so only a few passes are needed.
+    record_types = np.zeros(len(starts), dtype=np.int64)
+    active = np.ones(len(starts), dtype=bool)
+    k = 0
+    while active.any():
+        active &= starts + k < ends
+        c = data[np.minimum(starts + k, len(data) - 1)].astype(np.int64)
+        active &= (c >= ord('0')) & (c <= ord('9'))
+        record_types[active] = record_types[active] * 10 + c[active] - ord('0')
+        k += 1
+
+    return starts, ends, record_types
+
+def _gather_lines_numpy(data, starts, ends, selected):
+    """Concatenate the selected lines of raw IFF file contents
+
+    Parameters
+    ----------
+    data : ndarray of uint8
+        Raw file contents
+    starts, ends : ndarray
+        Line offsets, as returned by _scan_lines_numpy
+    selected : ndarray of bool
+        Which lines to include
+
+    Returns
+    -------
+    ndarray of uint8
+    """
+    return data[np.repeat(selected, ends - starts)]
+
+@functools.lru_cache(maxsize=None)
+def _kernels():
+    """Return the fastest available line scanning functions
+
+    These are the Cython kernels, if the extension was built when the
+    package was installed, or otherwise the vectorized NumPy
+    functions.
+
+    Returns
+    -------
+    scan_lines, gather_lines : callable
+        Functions with the same signatures as _scan_lines_numpy and
+        _gather_lines_numpy
+    """
+    try:
+        from . import _iff_scan
+    except ImportError:
+        # Extension was not built (Cython unavailable or build failed)
+        return _scan_lines_numpy, _gather_lines_numpy
+    return _iff_scan.scan_lines, _iff_scan.gather_lines
+
+def _arrow_type(dtype):
+    """Return the pyarrow type corresponding to an entry in _DTYPES"""
+    if dtype == 'str':
+        return pa.string()
+    elif dtype == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    else:
+        return pa.from_numpy_dtype(np.dtype(dtype))
+
+def _read_csv_arrow(buf, names, usecols, nfields, dtype, encoding, callsigns=None):
+    """Read buffered IFF records using pyarrow's multithreaded CSV reader
+
+    Parameters
+    ----------
+    buf : ndarray of uint8
+        Buffer containing the lines for a single record type
+    names : list of str
+        Names of the fields on each line, including any extraneous
+        empty columns at the end
+    usecols : tuple of str
+        Names of the columns to return
+    nfields : int
+        Number of fields on each line, which must be the same for all
+        lines.  This may be less than len(names) for files from older
+        format versions.
+    dtype : dict
+        Mapping of column names to data types, as in _DTYPES
+    encoding : str
+        Encoding of the buffered data
+    callsigns : None or list of str
+        If given, only return records whose AcId is in this list
+    """
+    if len(buf) == 0:
+        return pd.DataFrame(columns=list(usecols))
+    column_names = names[:nfields]
+    column_types = {c: _arrow_type(t) for c, t in dtype.items()}
+    table = pv.read_csv(pa.BufferReader(pa.py_buffer(buf)),
+                        read_options=pv.ReadOptions(column_names=column_names, block_size=1<<20, encoding=encoding),
+                        parse_options=pv.ParseOptions(delimiter=','),
+                        convert_options=pv.ConvertOptions(null_values=['', '?'], strings_can_be_null=True, column_types=column_types,
+                                                          include_columns=usecols, include_missing_columns=True))
+    if callsigns is not None:
+        # Filter in Arrow, before conversion to pandas
+        table = table.filter(pc.is_in(table['AcId'], value_set=pa.array(callsigns)))
+    # Columns that are entirely empty are inferred as null type; cast
+    # them to float for consistency with pd.read_csv
+    schema = pa.schema([pa.field(f.name, pa.float64()) if pa.types.is_null(f.type) else f for f in table.schema])
+    return table.cast(schema).to_pandas(split_blocks=True, self_destruct=True)
+
+def _seconds_to_datetime(t):
+    """Convert an array of seconds since the epoch to datetime64
+
+    Integer and float arrays are converted directly with NumPy, which
+    avoids the slower general-purpose path in pd.to_datetime.  Float
+    arrays holding only whole seconds, as is typical of IFF files, are
+    converted as integers.
+
+    Parameters
+    ----------
+    t : ndarray
+
+    Returns
+    -------
+    ndarray of datetime64[ns], or DatetimeIndex
+    """
+    if np.issubdtype(t.dtype, np.floating):
+        seconds = np.floor(t)
+        if np.array_equal(seconds, t):
+            # No fractional parts or missing values
+            t = seconds.astype(np.int64)
+        else:
+            missing = np.isnan(t)
+            t = np.where(missing, 0, t)
+            seconds = np.where(missing, 0, seconds)
+            # Convert whole and fractional seconds separately to avoid
+            # losing precision when scaling to nanoseconds
+            ns = seconds.astype(np.int64) * 10**9 + np.round((t - seconds) * 1e9).astype(np.int64)
+            ns[missing] = np.datetime64('NaT').astype(np.int64)
+            return ns.view('datetime64[ns]')
+    if np.issubdtype(t.dtype, np.integer):
+        return (t.astype(np.int64) * 10**9).view('datetime64[ns]')
+    return pd.to_datetime(t, unit='s', cache=True)
+
+def _read_records(buf, names, usecols, nfields, dtype, encoding, callsigns, chunksize, use_arrow):
+    """Parse the buffered lines for a single record type
+
+    Parameters are as for _read_csv_arrow, and chunksize is as for
+    read_iff_file.  If use_arrow is False, pd.read_csv is used instead
+    of pyarrow.
+
+    Returns
+    -------
+    DataFrame
+    """
+    # Parsing in low-memory mode is only safe when every column has an
+    # explicit data type; otherwise, inferred types may differ between
+    # the internal chunks, giving columns of mixed types.
+    low_memory = all(c in dtype for c in usecols)
+
+    if use_arrow:
+        df = _read_csv_arrow(buf, names, usecols, nfields, dtype, encoding, callsigns)
+    elif callsigns is None:
+        # The buffer holds only the requested rows, so there is
+        # no benefit to reading it in chunks
+        df = pd.read_csv(io.BytesIO(buf), header=None, names=names, usecols=usecols, dtype=dtype, na_values='?', encoding=encoding, low_memory=low_memory)
+    else:
+        chunks = []
+        for chunk in pd.read_csv(io.BytesIO(buf), header=None, names=names, usecols=usecols, dtype=dtype, na_values='?', encoding=encoding, chunksize=chunksize, low_memory=low_memory):
+            if len(callsigns) == 1:
+                # Comparing the categorical column directly compares
+                # integer codes rather than strings
+                mask = (chunk['AcId'] == callsigns[0]).to_numpy()
+            else:
+                mask = chunk['AcId'].isin(callsigns).to_numpy()
+            chunks.append(chunk[mask])
+        # Categories may differ between chunks, so reapply the
+        # data types after concatenating
+        df = pd.concat(chunks, ignore_index=True).astype(dtype)
+
+    # For consistency with other PARA-ATM data:
+    df.columns = _renamed_cols(usecols)
+
+    if 'time' in df:
+        df['time'] = _seconds_to_datetime(df['time'].to_numpy())
+    if 'altitude' in df:
+        df['altitude'] *= 100 # Convert 100s ft to ft
+
+    return df
+
+def read_iff_file(filename, record_types=3, callsigns=None, chunksize=50000, encoding='latin-1', columns=None):
     """
     Read IFF file and return data frames for requested record types
     
@@ -35,12 +337,20 @@ def read_iff_file(filename, record_types=3, callsigns=None, chunksize=50000, enc
         limits memory usage when working with large files, as we can
         extract out the desired rows from each chunk, isntead of
         reading everything into one large DataFrame and then taking a
-        subset.
+        subset.  Only used when filtering by callsign, if pyarrow is
+        not installed.
     encoding: str
-        Encoding argument passed on to open and pd.read_csv.  Using
+        Encoding of the file.  Using
         'latin-1' instead of the default will suppress errors that
         might otherwise occur with minor data corruption.  See
         http://python-notes.curiousefficiency.org/en/latest/python3/text_file_processing.html
+    columns : None or list of strings
+        If None, return all columns.  Otherwise, only read the given
+        columns, which reduces memory usage and parse time.  Names may
+        be given either as in the IFF specification (e.g., 'coord1')
+        or as in the returned DataFrame (e.g., 'latitude').  The
+        record type, time, callsign, latitude, longitude, and altitude
+        are always included, where present.
     
     Returns
     -------
@@ -53,47 +363,9 @@ def read_iff_file(filename, record_types=3, callsigns=None, chunksize=50000, enc
     # consistency with the behavior of other functions that expect
     # flight tracking data
 
-    # Determine file format version.  This is in record type 1, which
-    # for now we assume to occur on the first line.
-    with open(filename, 'r') as f:
-        version = parse_version(f.readline().split(',')[2])
-
-    # Columns for each record type, from version 2.6 specification.
-    cols = {0:['recType','comment'],
-            1:['recType','fileType','fileFormatVersion'],
-            2:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','acType','Orig','Dest','opsType','estOrig','estDest'],
-            3:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','coord1','coord2','alt','significance','coord1Accur','coord2Accur','altAccur','groundSpeed','course','rateOfClimb','altQualifier','altIndicator','trackPtStatus','leaderDir','scratchPad','msawInhibitInd','assignedAltString','controllingFac','controllingSeg','receivingFac','receivingSec','activeContr','primaryContr','kybrdSubset','kybrdSymbol','adsCode','opsType','airportCode'],
-            4:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','acType','Orig','Dest','altcode','alt','maxAlt','assignedAltString','requestedAltString','route','estTime','fltCat','perfCat','opsType','equipList','coordinationTime','coordinationTimeType','leaderDir','scratchPad1','scratchPad2','fixPairScratchPad','prefDepArrRoute','prefDepRoute','prefArrRoute'],
-            5:['recType','dataSource','programName','programVersion'],
-            6:['recType','recTime','Source','msgType','rectypeCat','sectorizationString'],
-            7:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','coord1','coord2','alt','significance','coord1Accur','coord2Accur','altAccur','msawtype','msawTimeCat','msawLocCat','msawMinSafeAlt','msawIndex1','msawIndex2','msawVolID'],
-            8:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','acType','Orig','Dest','depTime','depTimeType','arrTime','arrTimeType'],
-            9:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','coord1','coord2','alt','pitchAngle','trueHeading','rollAngle','trueAirSpeed','fltPhaseIndicator'],
-            10:['recType','recTime','fltKey','bcnCode','cid','Source','msgType','AcId','recTypeCat','configType','configSpec']}
-
-    # For newer versions, additional columns are supported.  However,
-    # this code could be commented out, and it should still be
-    # compatible with newer versions, but just ignoring the additional
-    # columns.
-    if version >= parse_version('2.13'):
-        cols[2] += ['modeSCode']
-        cols[3] += ['trackNumber','tptReturnType','modeSCode']
-        cols[4] += ['coordinationPoint','coordinationPointType','trackNumber','modeSCode']
-    if version >= parse_version('2.15'):
-        cols[3] += ['sensorTrackNumberList','spi','dvs','dupM3a','tid']
-
-    # Determine the record type of each row
-    with open(filename, 'r', encoding=encoding) as f:
-        # An alternative, using less memory, would be to directly
-        # create skiprows indices for a particular record type, using
-        # a comprehension on enumerate(f); however, that would not
-        # allow handling multiple record types.
-        line_record_types = [int(line.split(',')[0]) for line in f]
-
     # Determine which record types to retrieve, and whether the result
     # should be a scalar or dict:
     if record_types == 'all':
-        record_types = np.unique(line_record_types)
         scalar_result = False
     elif hasattr(record_types, '__getitem__'):
         scalar_result = False
@@ -104,39 +376,97 @@ def read_iff_file(filename, record_types=3, callsigns=None, chunksize=50000, enc
     if callsigns is not None:
         callsigns = list(np.atleast_1d(callsigns))
 
+    # Map the file into memory rather than reading it into a Python
+    # bytes object; the OS pages it in as it is scanned.  The lines for
+    # each record type are copied out into separate buffers, so the
+    # mapping can be released before parsing.
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = np.frombuffer(mm, dtype=np.uint8)
+        scan_lines, gather_lines = _kernels()
+        starts, ends, line_record_types = scan_lines(data)
 
-    data_frames = dict()
-    for record_type in record_types:
-        # Construct list of rows to skip:
-        skiprows = [i for i,lr in enumerate(line_record_types) if lr != record_type]
-        
-        # Passing usecols is necessary because for some records, the
-        # actual data has extraneous empty columns at the end, in which
-        # case the data does not seem to get read correctly without
-        # usecols
-        if callsigns is None:
-            df = pd.concat((chunk for chunk in pd.read_csv(filename, header=None, skiprows=skiprows, names=cols[record_type], usecols=cols[record_type], na_values='?', encoding=encoding, chunksize=chunksize, low_memory=False)), ignore_index=True)
-        else:
-            df = pd.concat((chunk[chunk['AcId'].isin(callsigns)] for chunk in pd.read_csv(filename, header=None, skiprows=skiprows, names=cols[record_type], usecols=cols[record_type], na_values='?', encoding=encoding, chunksize=chunksize, low_memory=False)), ignore_index=True)
-
-        # For consistency with other PARA-ATM data:
-        df.rename(columns={'recTime':'time',
-                           'AcId':'callsign',
-                           'coord1':'latitude',
-                           'coord2':'longitude',
-                           'alt':'altitude',
-                           'rateOfClimb':'rocd',
-                           'groundSpeed':'tas',
-                           'course':'heading'},
-                  inplace=True)
-
-        if 'time' in df:
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-        if 'altitude' in df:
-            df['altitude'] *= 100 # Convert 100s ft to ft
+        # Determine file format version.  This is in record type 1,
+        # which for now we assume to occur on the first line.
+        version = mm[:ends[0]].split(b',')[2].decode(encoding)
+
+        if record_types == 'all':
+            # Record types are small non-negative integers, so a
+            # histogram is cheaper than sorting with np.unique
+            record_types = np.flatnonzero(np.bincount(line_record_types))
+
+        # Lines to keep, in addition to matching the record type
+        keep_lines = None
+        if callsigns is not None:
+            # Cheap pre-filter on callsign, so that the CSV parser
+            # never sees most non-matching rows.  This may let through
+            # lines where the callsign appears in some other field, so
+            # the exact match on AcId is still applied below.
+            pattern = b',(?:' + b'|'.join(re.escape(c.encode(encoding)) for c in callsigns) + b')(?=,)'
+            matches = [m.start() for m in re.finditer(pattern, mm)]
+            keep_lines = np.zeros(len(starts), dtype=bool)
+            keep_lines[np.searchsorted(starts, matches, side='right') - 1] = True
+
+        # Gather the lines for each record type into a separate
+        # buffer.  This avoids re-parsing the whole file for each
+        # record type.
+        buffers = dict()
+        nfields = dict()
+        uniform_fields = dict()
+        for record_type in record_types:
+            is_type = line_record_types == record_type
+            if not is_type.any():
+                continue
+            if keep_lines is not None:
+                is_type &= keep_lines
+            buf = gather_lines(data, starts, ends, is_type)
+            buffers[record_type] = buf
+
+            # Count the fields on each gathered line.  Lines of the same
+            # record type may differ in their number of trailing empty
+            # fields, which pyarrow does not accept.
+            lengths = (ends - starts)[is_type]
+            if len(lengths) > 0:
+                commas = np.add.reduceat(buf == ord(','), np.cumsum(lengths) - lengths, dtype=np.int64)
+                nfields[record_type] = commas.max() + 1
+                uniform_fields[record_type] = commas.min() == commas.max()
+
+        # Drop our references to the mapping, which is unmapped once
+        # no views of it remain.  It is not closed explicitly, as that
+        # raises BufferError while any view of it is still alive.
+        del data, mm
+
+    cols = _cols_for_version(version)
+
+    if columns is not None:
+        iff_names = {v: k for k, v in _RENAMES.items()}
+        keep = {iff_names.get(c, c) for c in columns} | _REQUIRED_COLS
+
+    # Parse each record type in a separate thread.  The CSV readers
+    # release the GIL for much of their work.
+    futures = dict()
+    with ThreadPoolExecutor(max_workers=max(1, min(len(record_types), os.cpu_count() or 1))) as executor:
+        for record_type in record_types:
+            buf = buffers.get(record_type, np.empty(0, dtype=np.uint8))
+
+            # Passing usecols is necessary because for some records,
+            # the actual data has extraneous empty columns at the end,
+            # which are given placeholder names here
+            names = list(cols[record_type]) + ['_extra{}'.format(i) for i in range(len(cols[record_type]), nfields.get(record_type, 0))]
+            if columns is None:
+                usecols = cols[record_type]
+            else:
+                usecols = tuple(c for c in cols[record_type] if c in keep)
+            dtype = {c: t for c, t in _DTYPES.get(record_type, {}).items() if c in usecols}
+
+            # Use pyarrow if available, unless the number of fields
+            # varies between lines
+            use_arrow = pv is not None and uniform_fields.get(record_type, True)
+
+            futures[record_type] = executor.submit(_read_records, buf, names, usecols, nfields.get(record_type, 0), dtype, encoding, callsigns, chunksize, use_arrow)
 
         # Store to dict of data frames
-        data_frames[record_type] = df
+        data_frames = {record_type: future.result() for record_type, future in futures.items()}
 
     if scalar_result:
         result = data_frames[record_types[0]]
@@ -2,9 +2,12 @@ import unittest
 import pandas as pd
 import numpy as np
 import os
+import tempfile
+from unittest import mock
 
 from paraatm.io.nats import read_nats_output_file, NatsEnvironment
 from paraatm.io.gnats import read_gnats_output_file, GnatsEnvironment, GnatsBasicSimulation
+from paraatm.io import iff
 from paraatm.io.iff import read_iff_file
 from paraatm.io.utils import read_csv_file
 from paraatm.safety.ground_ssd import ground_ssd_safety_analysis
@@ -42,27 +45,133 @@ class TestGNATSFiles(unittest.TestCase):
         self.assertEqual(df.shape, (218, 13))
         
 class TestIFFFiles(unittest.TestCase):
-    def test_read_iff(self):
+    # Read each sample file once, and share the results between tests
+    @classmethod
+    def setUpClass(cls):
         filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_ABC123.csv')
-        df_dict = read_iff_file(filename, 'all')
+        cls.df_all = read_iff_file(filename, 'all')
 
+        filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_3aircraft.csv')
+        cls.df_abc = read_iff_file(filename, callsigns='ABC123')
+        cls.df_def_ghi = read_iff_file(filename, callsigns=['DEF456','GHI789'])
+        cls.df_columns = read_iff_file(filename, columns=['tas','course'])
+
+    def test_read_iff(self):
         expected_rows = {0:1, 1:1, 2:1, 3:724, 4:6}
 
         # Basic consistency check on number of entries for each record:
-        for rec, df in df_dict.items():
+        for rec, df in self.df_all.items():
             self.assertEqual(len(df), expected_rows[rec])
 
     def test_read_iff_callsigns(self):
-        filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_3aircraft.csv')
-
-        df = read_iff_file(filename, callsigns='ABC123')
+        df = self.df_abc
         self.assertEqual(len(df), 194)
         self.assertEqual(len(df['callsign'].unique()), 1)
 
-        df = read_iff_file(filename, callsigns=['DEF456','GHI789'])
+        df = self.df_def_ghi
         self.assertEqual(len(df), 372)
         self.assertEqual(len(df['callsign'].unique()), 2)
 
+    def test_read_iff_columns(self):
+        df = self.df_columns
+        self.assertEqual(list(df.columns), ['recType','time','callsign','latitude','longitude','altitude','tas','heading'])
+        self.assertEqual(len(df), 566)
+
+    @staticmethod
+    def _write_ragged_copy(filename, tmpdir):
+        """Copy an IFF file, adding an empty trailing field to every
+        other record so that the lines of each record type differ in
+        field count"""
+        with open(filename, 'rb') as f:
+            lines = f.read().splitlines(keepends=True)
+        ragged = b''.join(line.rstrip(b'\n') + b',\n' if i % 2 else line
+                          for i, line in enumerate(lines))
+        ragged_file = os.path.join(tmpdir, os.path.basename(filename))
+        with open(ragged_file, 'wb') as f:
+            f.write(ragged)
+        return ragged_file
+
+    def test_read_iff_ragged_fields(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_ABC123.csv')
+            df_all = read_iff_file(self._write_ragged_copy(filename, tmpdir), 'all')
+
+            filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_3aircraft.csv')
+            df_abc = read_iff_file(self._write_ragged_copy(filename, tmpdir), callsigns='ABC123')
+
+        expected_rows = {0:1, 1:1, 2:1, 3:724, 4:6}
+        self.assertEqual(df_all.keys(), expected_rows.keys())
+        for rec, df in df_all.items():
+            self.assertEqual(len(df), expected_rows[rec])
+            self.assertFalse(any(col.startswith('_extra') for col in df.columns))
+
+        self.assertEqual(len(df_abc), 194)
+        self.assertEqual(len(df_abc['callsign'].unique()), 1)
+
+    @unittest.skipIf(iff.pv is None, "pyarrow is not installed")
+    def test_read_iff_pandas_matches_pyarrow(self):
+        # Compare the pd.read_csv fallback, used without pyarrow or for
+        # lines that differ in field count, with the pyarrow reader
+        filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_3aircraft.csv')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ragged_file = self._write_ragged_copy(filename, tmpdir)
+
+            expected = read_iff_file(filename, 'all')
+            with mock.patch.object(iff, 'pv', None):
+                results = [read_iff_file(filename, 'all'),
+                           read_iff_file(ragged_file, 'all')]
+            results.append(read_iff_file(ragged_file, 'all'))
+
+        # pandas sorts categories, while pyarrow keeps them in order of
+        # appearance
+        for result in results:
+            self.assertEqual(result.keys(), expected.keys())
+            for rec in expected:
+                pd.testing.assert_frame_equal(result[rec], expected[rec], check_categorical=False)
+
+class TestIFFKernels(unittest.TestCase):
+    def _kernel_pairs(self):
+        pairs = [(iff._scan_lines_numpy, iff._gather_lines_numpy)]
+        try:
+            from paraatm.io import _iff_scan
+        except ImportError:
+            pass
+        else:
+            pairs.append((_iff_scan.scan_lines, _iff_scan.gather_lines))
+        return pairs
+
+    def _check_kernels(self, raw):
+        # Reference result, splitting the lines in Python
+        lines = [line + b'\n' for line in raw.split(b'\n')]
+        lines[-1] = lines[-1][:-1]
+        if lines[-1] == b'':
+            lines.pop()
+        lengths = [len(line) for line in lines]
+        expected_ends = np.cumsum(lengths)
+        expected_types = [int(line.split(b',')[0]) for line in lines]
+        selected = np.array([t == 3 for t in expected_types])
+        expected_buf = b''.join(line for line, keep in zip(lines, selected) if keep)
+
+        data = np.frombuffer(raw, dtype=np.uint8)
+        for scan_lines, gather_lines in self._kernel_pairs():
+            starts, ends, record_types = scan_lines(data)
+            np.testing.assert_array_equal(ends, expected_ends)
+            np.testing.assert_array_equal(starts, expected_ends - lengths)
+            np.testing.assert_array_equal(record_types, expected_types)
+            buf = gather_lines(data, starts, ends, selected)
+            self.assertEqual(bytes(buf), expected_buf)
+
+    def test_sample_file(self):
+        filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_ASDEX_3aircraft.csv')
+        with open(filename, 'rb') as f:
+            self._check_kernels(f.read())
+
+    def test_no_trailing_newline(self):
+        self._check_kernels(b'3,a\n10,b\n3,c')
+
+    def test_crlf(self):
+        self._check_kernels(b'2,a\r\n3,b,c\r\n10,d\r\n3,e\r\n')
+
 class TestGroundSSD(unittest.TestCase):
     def test_ground_ssd(self):
         filename = os.path.join(THIS_DIR, '..', 'sample_data/IFF_SFO_window.csv')
@@ -1,13 +1,27 @@
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
 from os import path
 
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    # Cython is optional; paraatm.io.iff falls back to NumPy kernels
+    ext_modules = []
+else:
+    # optional=True lets the install succeed if the build fails
+    ext_modules = cythonize([Extension('paraatm.io._iff_scan',
+                                       ['paraatm/io/_iff_scan.pyx'],
+                                       optional=True)])
+
 setup(
         name='para-atm',
         version='0.2',
         description='Probabilistic toolset for air traffic safety analysis',
         packages=find_packages(),
+        # Optional compiled kernels for scanning IFF files
+        ext_modules=ext_modules,
         install_requires=[
             'pandas',
+            'packaging',
             'pyclipper',
             'bokeh',
             # matplotlib is used by some GNATS examples